@@ -1,17 +1,80 @@
+import asyncio
 import logging
 import json
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.config import Config
-from src.database import db
-from src.llm import client
-from src.schema import get_specific_collection_schema
+from src.database import get_db, close_db
+from src.llm import get_client, close_client
+from src.cache import chat_cache
+from src.schema import get_specific_collection_schema, get_collection_names, warm_schema_cache
 from src.models import ChatRequest
 from pydantic import BaseModel
-from src.engine import get_system_prompt, execute_mongo_query, extract_json_actions
+from pymongo import InsertOne
+from src.engine import get_system_prompt, execute_mongo_query, extract_json_actions, run_bulk_requests, new_bulk_summary, merge_bulk_summary
+from src.stream import (
+    STREAM_MEDIA_TYPES, encode_stream, encode_events, text_event, dom_action_event,
+    tool_status_event, done_event, error_event
+)
+from src.runs import run_manager, RunQueueFull
+
+async def warm_up(app: FastAPI):
+    """
+    Opens the Mongo pool and loads the collection catalog and schemas so the
+    first real request does not pay for them. Records per-phase timings.
+    """
+    if app.state.ready: return True
+    db = get_db()
+    if db is None: return False
+    timings = {}
+    try:
+        t = time.perf_counter()
+        await db.command("ping")
+        timings["mongo_ping_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+        t = time.perf_counter()
+        names = await get_collection_names(db, force_refresh=True)
+        timings["catalog_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+        t = time.perf_counter()
+        await warm_schema_cache(db, names)
+        timings["schemas_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    except Exception as e:
+        logging.error(f"Warm-up failed: {e}")
+        return False
+    app.state.startup.update(timings)
+    app.state.ready = True
+    return True
 
-app = FastAPI(title="MongoDB AI Assistant API")
+async def retry_warm_up(app: FastAPI):
+    # Background retries so a worker recovers once MongoDB becomes reachable
+    while not await warm_up(app):
+        await asyncio.sleep(Config.WARMUP_RETRY_INTERVAL)
+    logging.info(f"Warm-up succeeded on retry: {app.state.startup}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    app.state.ready = False
+    app.state.startup = {}
+    get_client()
+    run_manager.start()
+    await warm_up(app)
+    app.state.startup["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logging.info(f"Startup finished (ready={app.state.ready}): {app.state.startup}")
+    retry_task = None if app.state.ready else asyncio.create_task(retry_warm_up(app))
+    yield
+    if retry_task is not None:
+        retry_task.cancel()
+    await run_manager.stop()
+    await close_client()
+    close_db()
+
+app = FastAPI(title="MongoDB AI Assistant API", lifespan=lifespan)
 
 # Add CORS Middleware
 app.add_middleware(
@@ -26,107 +89,169 @@ class ChatRequest(BaseModel):
     message: str
     history: list = []
     ui_context: str = None  # Optional field for UI context
+    stream_format: str = "text"  # "text" (legacy), "sse" or "ndjson"
+    resumable: bool = False  # Run in the background so the stream can be resumed (sse/ndjson only)
 
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the MongoDB AI Assistant API!"}
 
-@app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
-    async def event_generator():
-        messages = [{"role": "system", "content": await get_system_prompt(request.message, request.ui_context)}] + request.history + [{"role": "user", "content": request.message}]
-        
-        # 1. Try Cache First
-        from src.cache import chat_cache
-        cached_response = chat_cache.get(messages)
-        if cached_response:
-            yield f"[Cached Answer]\n{cached_response}"
-            return
+@app.get("/ready")
+async def readiness():
+    # Report only; failed warm-ups are retried by a background task started in the lifespan
+    status_code = 200 if app.state.ready else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"status": "ready" if app.state.ready else "starting", "startup": app.state.startup}
+    )
 
-        full_turn_content = ""
-        for _ in range(Config.MAX_STEPS):
-            try:
-                # 2. Async Client Streaming
-                response = await client.chat.completions.create(
-                    model=Config.MODEL_NAME,
-                    messages=messages,
-                    temperature=0.1,
-                    stream=True
-                )
+async def agent_events(request: ChatRequest):
+    """Runs the multi-step agent loop, yielding typed stream events."""
+    messages = [{"role": "system", "content": await get_system_prompt(request.message, request.ui_context, request.history)}] + request.history + [{"role": "user", "content": request.message}]
+
+    # 1. Try Cache First
+    cached_response = chat_cache.get(messages)
+    if cached_response:
+        yield text_event(cached_response, cached=True)
+        yield done_event(cached=True)
+        return
+
+    full_turn_content = ""
+    for _ in range(Config.MAX_STEPS):
+        try:
+            # 2. Async Client Streaming
+            response = await get_client().chat.completions.create(
+                model=Config.MODEL_NAME,
+                messages=messages,
+                temperature=0.1,
+                stream=True
+            )
+            
+            step_content = ""
+            is_json_block = False
+            
+            async for chunk in response:
+                content = chunk.choices[0].delta.content or ""
+                step_content += content
                 
-                step_content = ""
-                is_json_block = False
+                # 1. Toggle is_json_block based on total count of backtick blocks
+                is_json_block = (step_content.count("```") % 2 != 0)
                 
-                async for chunk in response:
-                    content = chunk.choices[0].delta.content or ""
-                    step_content += content
-                    
-                    # 1. Toggle is_json_block based on total count of backtick blocks
-                    is_json_block = (step_content.count("```") % 2 != 0)
-                    
-                    # 2. Only yield if it's NOT a hidden orchestration block
-                    if not is_json_block:
-                        # Avoid yielding snippets that are partial starts of ```
-                        # Also avoid yielding the closing ``` itself if it just toggled off
-                        if "```" not in content and not ("```".startswith(content.strip()) or content.strip().startswith("`")):
-                             yield content
-                    else:
-                        pass # Silently consume orchestration tokens
-
-                full_turn_content += step_content
-                actions_data = extract_json_actions(step_content)
+                # 2. Only yield if it's NOT a hidden orchestration block
+                if not is_json_block:
+                    # Avoid yielding snippets that are partial starts of ```
+                    # Also avoid yielding the closing ``` itself if it just toggled off
+                    if "```" not in content and not ("```".startswith(content.strip()) or content.strip().startswith("`")):
+                         yield text_event(content)
+                else:
+                    pass # Silently consume orchestration tokens
+
+            full_turn_content += step_content
+            actions_data = extract_json_actions(step_content)
+            
+            if actions_data:
+                # We have at least one action.
+                # We will execute all of them.
+                # Note: For DB queries, executing multiple logic might be complex if they depend on each other.
+                # But for DOM actions, batching is perfect.
                 
-                if actions_data:
-                    # We have at least one action.
-                    # We will execute all of them.
-                    # Note: For DB queries, executing multiple logic might be complex if they depend on each other.
-                    # But for DOM actions, batching is perfect.
-                    
-                    messages.append({"role": "assistant", "content": step_content})
-                    
-                    interaction_results = []
+                messages.append({"role": "assistant", "content": step_content})
+                
+                interaction_results = []
+                
+                for action_data in actions_data:
+                    action = action_data.get("action")
                     
-                    for action_data in actions_data:
-                        action = action_data.get("action")
+                    if action == "get_schema":
+                        yield tool_status_event(action, "running", collections=action_data.get("collections"))
+                        schema_info = await get_specific_collection_schema(get_db(), action_data.get("collections", []))
+                        messages.append({"role": "system", "content": f"SCHEMA DATA:\n{schema_info}"})
+                        interaction_results.append(f"Schema data for {action_data.get('collections', [])} added to system context.")
+                        print(f"[LOG] Schema Fetch: {action_data.get('collections')}")
+                        yield tool_status_event(action, "done", collections=action_data.get("collections"))
                         
-                        if action == "get_schema":
-                            schema_info = await get_specific_collection_schema(db, action_data.get("collections", []))
-                            messages.append({"role": "system", "content": f"SCHEMA DATA:\n{schema_info}"})
-                            interaction_results.append(f"Schema data for {action_data.get('collections', [])} added to system context.")
-                            print(f"[LOG] Schema Fetch: {action_data.get('collections')}")
-                            
-                        elif action in ["query", "insert", "update", "delete"]:
-                            print(f"[System]: Executing {action} on {action_data.get('collection')}...")
-                            result = await execute_mongo_query(action_data)
-                            interaction_results.append(f"Action '{action}': {result}")
-                            print(f"[LOG] Action Executed: {action}")
-                            
-                        elif action == "dom_interaction":
-                            print(f"[System]: Converting to Frontend Action: {action_data}")
-                            yield f"[DOM_ACTION]{json.dumps(action_data)}[/DOM_ACTION]"
-                            interaction_results.append("Action dispatched to UI.")
-
-                    # Should we continue the loop?
-                    # If we did any DB actions, we probably want the AI to see the result and formulate an answer.
-                    # If we only did DOM actions, we might also want it to say "I've filled the form".
-                    
-                    if interaction_results:
-                        result_summary = "\n".join(interaction_results)
-                        messages.append({"role": "user", "content": f"System Execution Results:\n{result_summary}"})
-                        continue
-                    else:
-                        # Actions found but logic skipped? Break to avoid loop.
-                        break
+                    elif action in ["query", "insert", "update", "delete", "insert_many", "bulk_write"]:
+                        print(f"[System]: Executing {action} on {action_data.get('collection')}...")
+                        yield tool_status_event(action, "running", collection=action_data.get("collection"))
+                        result = await execute_mongo_query(action_data)
+                        interaction_results.append(f"Action '{action}': {result}")
+                        print(f"[LOG] Action Executed: {action}")
+                        yield tool_status_event(action, "done", collection=action_data.get("collection"))
+                        
+                    elif action == "dom_interaction":
+                        print(f"[System]: Converting to Frontend Action: {action_data}")
+                        yield dom_action_event(action_data)
+                        interaction_results.append("Action dispatched to UI.")
+
+                # Should we continue the loop?
+                # If we did any DB actions, we probably want the AI to see the result and formulate an answer.
+                # If we only did DOM actions, we might also want it to say "I've filled the form".
                 
-                # If we reached here without a 'continue', it's the final answer
-                chat_cache.set(messages[:-1] + [{"role": "user", "content": request.message}], step_content)
-                break
-            except Exception as e:
-                print(f"ERROR: {e}")
-                yield f"\n[Error processing request]\n"
-                break
+                if interaction_results:
+                    result_summary = "\n".join(interaction_results)
+                    messages.append({"role": "user", "content": f"System Execution Results:\n{result_summary}"})
+                    continue
+                else:
+                    # Actions found but logic skipped? Break to avoid loop.
+                    break
+            
+            # If we reached here without a 'continue', it's the final answer
+            chat_cache.set(messages[:-1] + [{"role": "user", "content": request.message}], step_content)
+            break
+        except Exception as e:
+            print(f"ERROR: {e}")
+            yield error_event("Error processing request")
+            return
+
+    yield done_event()
+
+@app.post("/chat")
+async def chat_endpoint(request: ChatRequest):
+    if request.stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown stream_format '{request.stream_format}'. Use one of: {', '.join(STREAM_MEDIA_TYPES)}")
+
+    if request.resumable:
+        if request.stream_format == "text":
+            raise HTTPException(status_code=400, detail="Resumable runs require stream_format 'sse' or 'ndjson'.")
+        try:
+            run = run_manager.submit(lambda: agent_events(request))
+        except RunQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return StreamingResponse(
+            encode_events(run.follow(0), request.stream_format),
+            media_type=STREAM_MEDIA_TYPES[request.stream_format],
+            headers={"X-Run-Id": run.run_id}
+        )
+
+    return StreamingResponse(
+        encode_stream(agent_events(request), request.stream_format),
+        media_type=STREAM_MEDIA_TYPES[request.stream_format]
+    )
+
+@app.get("/chat/runs/{run_id}")
+async def resume_run(run_id: str, request: Request, offset: int = 0, stream_format: str = "ndjson"):
+    """
+    Re-attaches to a resumable run, replaying buffered events from `offset`
+    (the first event to send) and then following it live. SSE clients may
+    send Last-Event-ID instead.
+    """
+    if stream_format not in STREAM_MEDIA_TYPES or stream_format == "text":
+        raise HTTPException(status_code=400, detail="stream_format must be 'sse' or 'ndjson'.")
+    run = run_manager.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired.")
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be >= 0.")
 
-    return StreamingResponse(event_generator(), media_type="text/plain")
+    return StreamingResponse(
+        encode_events(run.follow(offset), stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers={"X-Run-Id": run.run_id}
+    )
 
 class UserModel(BaseModel):
     name: str
@@ -135,12 +260,12 @@ class UserModel(BaseModel):
 
 @app.post("/users")
 async def register_user(user: UserModel):
+    db = get_db()
     try:
         if db is None:
             raise HTTPException(status_code=503, detail="Database not connected")
         
         doc = user.dict()
-        from datetime import datetime
         doc["timestamp"] = datetime.utcnow()
         
         result = await db["users"].insert_one(doc)
@@ -149,10 +274,82 @@ async def register_user(user: UserModel):
         print(f"Registration Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def iter_batch_items(request: Request):
+    """Yields (index, item) from a JSON array body or an NDJSON stream; item is an Exception if a line is invalid."""
+    if "ndjson" not in request.headers.get("content-type", ""):
+        try:
+            items = await request.json()
+        except ValueError:
+            items = None
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of users or an NDJSON body.")
+        for index, item in enumerate(items):
+            yield index, item
+        return
+
+    index, pending = 0, b""
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if not line.strip(): continue
+            try:
+                yield index, json.loads(line)
+            except ValueError as e:
+                yield index, e
+            index += 1
+    if pending.strip():
+        try:
+            yield index, json.loads(pending)
+        except ValueError as e:
+            yield index, e
+
+@app.post("/users/batch")
+async def register_users_batch(request: Request):
+    """
+    Registers many users in one request. Accepts a JSON array of users, or an
+    NDJSON stream (Content-Type: application/x-ndjson) with one user per line.
+    Items are validated and inserted independently; failures are reported by index.
+    """
+    db = get_db()
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not connected")
+
+    summary = new_bulk_summary()
+    received = 0
+    batch = []  # (index, InsertOne) pairs, flushed every BULK_CHUNK_SIZE items
+    try:
+        async for index, item in iter_batch_items(request):
+            received += 1
+            try:
+                if isinstance(item, Exception): raise item
+                doc = UserModel(**item).dict()
+            except Exception as e:
+                summary["errors"].append({"index": index, "error": str(e)})
+                continue
+            doc["timestamp"] = datetime.utcnow()
+            batch.append((index, InsertOne(doc)))
+            if len(batch) >= Config.BULK_CHUNK_SIZE:
+                merge_bulk_summary(summary, await run_bulk_requests(db["users"], batch))
+                batch = []
+        if batch:
+            merge_bulk_summary(summary, await run_bulk_requests(db["users"], batch))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Batch Registration Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    errors = sorted(summary["errors"], key=lambda e: e["index"])
+    return {
+        "status": "partial" if errors else "success",
+        "received": received,
+        "inserted_count": summary["inserted_count"],
+        "errors": errors,
+    }
+
 @app.get("/collections")
 async def get_collections():
-    from src.schema import get_collection_names
-    return {"collections": await get_collection_names(db)}
+    return {"collections": await get_collection_names(get_db())}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,8 +1,9 @@
 from src.config import Config
-from src.database import db
+from src.database import get_db
 from src.llm import call_llm_stream
 from src.schema import get_specific_collection_schema
 from src.engine import get_system_prompt, execute_mongo_query, extract_json_action
+from src.cache import chat_cache
 
 import asyncio
 
@@ -25,7 +26,6 @@ async def start_chat():
             
             history.append({"role": "user", "content": user_input})
             
-            from src.cache import chat_cache
             cached_response = chat_cache.get(history)
             if cached_response:
                 print(f"Assistant: [Cached Answer]\n{cached_response}")
@@ -48,11 +48,11 @@ async def start_chat():
                     if action == "get_schema":
                         targets = action_data.get("collections", [])
                         print(f"[System]: Fetching schemas for {targets}...")
-                        schema_info = await get_specific_collection_schema(db, targets)
+                        schema_info = await get_specific_collection_schema(get_db(), targets)
                         history.append({"role": "assistant", "content": step_content})
                         history.append({"role": "system", "content": f"SCHEMA DATA:\n{schema_info}"})
                         continue
-                    elif action in ["query", "insert", "update", "delete"]:
+                    elif action in ["query", "insert", "update", "delete", "insert_many", "bulk_write"]:
                         print(f"[System]: Executing {action} on {action_data.get('collection')}...")
                         result = await execute_mongo_query(action_data)
                         history.append({"role": "assistant", "content": step_content})
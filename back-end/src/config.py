@@ -11,6 +11,33 @@ class Config:
     #MODEL_NAME = "xiaomi/mimo-v2-flash:free"
     #MODEL_NAME = "mistralai/mistral-7b-instruct:free"
     CACHE_TTL = 3600  # 1 hour
+    CATALOG_TTL = 60  # Seconds the collection name list is reused before re-listing
     MAX_STEPS = 10
     DEFAULT_LIMIT = 50
+    BULK_CHUNK_SIZE = 500  # Write requests sent per bulk_write round trip
+    BULK_MAX_REPORTED_ERRORS = 20  # Per-item errors fed back to the model
+    PROMPT_MAX_COLLECTIONS = 25  # Top-k collections listed in DB_COLS
+    PROMPT_HISTORY_MESSAGES = 4  # Recent history messages used to rank collections
+    EXAMPLE_TOP_K = 3  # Max few-shot examples per prompt
+    EXAMPLE_TOKEN_BUDGET = 400  # Approximate token budget for few-shot examples
+    EXAMPLE_MIN_SCORE_RATIO = 0.1  # Skip near-zero matches relative to the best example
+    STREAM_FRAME_INTERVAL = 0.02  # Seconds of text batched per frame in SSE/NDJSON mode
+    STREAM_FRAME_MAX_CHARS = 1024  # Flush a frame early once it grows this large
+    RUN_WORKERS = 8  # Background workers executing resumable agent runs
+    RUN_QUEUE_SIZE = 64  # Runs waiting for a worker before /chat answers 503
+    RUN_TTL = 900  # Seconds a finished run stays available for resume
+    RUN_BUFFER_BUDGET_BYTES = 50 * 1024 * 1024  # Memory budget for buffered run output
 
+    # Connection pools & startup (tunable per deployment)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))  # Opened eagerly during warm-up
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    WARMUP_SCHEMA_LIMIT = int(os.getenv("WARMUP_SCHEMA_LIMIT", "50"))  # Collections sampled before ready
+    WARMUP_CONCURRENCY = 8
+    WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "10"))  # Seconds between background warm-up retries
@@ -4,19 +4,40 @@ from src.config import Config
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Created lazily (normally by the app lifespan) so importing this module stays cheap
+_client = None
+_db = None
+_missing_uri_logged = False
+
 def get_db():
+    """Returns the shared database handle, creating the pooled client on first use."""
+    global _client, _db, _missing_uri_logged
+    if _db is not None:
+        return _db
     if not Config.MONGO_URI:
-        logging.error("MONGO_URI not found in configuration.")
+        if not _missing_uri_logged:
+            logging.error("MONGO_URI not found in configuration.")
+            _missing_uri_logged = True
         return None
     try:
         # Use AsyncIOMotorClient for non-blocking DB calls
-        client = AsyncIOMotorClient(Config.MONGO_URI)
-        db = client.get_default_database()
+        _client = AsyncIOMotorClient(
+            Config.MONGO_URI,
+            maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=Config.MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+        )
+        _db = _client.get_default_database()
         logging.info("Connected to MongoDB via Async Motor")
-        return db
+        return _db
     except Exception as e:
         logging.error(f"Failed to connect to MongoDB: {e}")
         return None
 
-# Singleton instance
-db = get_db()
+def close_db():
+    global _client, _db
+    if _client is not None:
+        _client.close()
+    _client, _db = None, None
@@ -1,9 +1,13 @@
 import json
 import re
-from src.database import db
+from functools import lru_cache
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError
+from src.database import get_db
 from src.config import Config
-from src.schema import get_collection_names, get_specific_collection_schema
-from src.examples import EXAMPLES_BY_CATEGORY
+from src.schema import get_collection_names, rank_collections, invalidate_collection_catalog
+from src.search import tokenize
+from src.examples import EXAMPLE_SNIPPETS, EXAMPLE_INDEX, CONFIRMATION_EXAMPLES
 
 SYSTEM_PROMPT_TEMPLATE = """ROLE: Expert MongoDB Assistant
 DB_COLS: {collections}
@@ -23,6 +27,9 @@ PROTOCOL:
    - DO NOT output the execution JSON block until the user says "Yes", "Proceed", "Confirm", or similar.
 3. [Executing Data Action] -> 
    - ONLY after user confirmation, output: ```json {{ "action": "query|insert|update|delete", "collection": "...", "type": "find|count|agg", "filter": {{}}, "pipeline": [], "document": {{}}, "update": {{}} }} ```
+   - For many records at once, use ONE block instead of one step per record:
+     ```json {{ "action": "insert_many", "collection": "...", "documents": [{{}}, {{}}] }} ```
+     ```json {{ "action": "bulk_write", "collection": "...", "operations": [{{ "insert_one": {{ "document": {{}} }} }}, {{ "update_one": {{ "filter": {{}}, "update": {{}} }} }}, {{ "delete_one": {{ "filter": {{}} }} }}] }} ```
 4. [DOM Interaction] -> Output: ```json {{ "action": "dom_interaction", "target": "#selector", "type": "click|type", "value": "..." }} ```
 5. [UI Navigation] ->
    - Use the provided `UI_CONTEXT` to find the correct `selector` for navigation.
@@ -54,46 +61,83 @@ RULES:
 - Update/Delete: ALWAYS use specific filters. If searching by name, verify the record exists first.
 """
 
-async def get_system_prompt(user_message="", ui_context=""):
-    all_cols = await get_collection_names(db)
-    
-    # Dynamic Example Selection
-    selected_examples = ""
-    msg_low = user_message.lower()
-    
-    # Always include iterative for safety if any write/edit intent is detected
-    if any(k in msg_low for k in ["add", "insert", "create", "update", "change", "set", "remove", "delete", "edit", "modify"]):
-        selected_examples += EXAMPLES_BY_CATEGORY["iterative"]
-    
-    if any(k in msg_low for k in ["how many", "count", "average", "avg", "sum", "total", "math"]):
-        selected_examples += EXAMPLES_BY_CATEGORY["aggregation"]
-    
-    # If it looks like a person/contact search or ambiguous query
-    if any(k in msg_low for k in ["find", "search", "who is", "email", "phone", "contact", "name"]):
-        selected_examples += EXAMPLES_BY_CATEGORY["search"]
+def conversation_query(user_message, history):
+    """Retrieval query: the current message plus the tail of the conversation."""
+    # History is client-supplied: skip anything that isn't a message with plain string content
+    recent = [m.get("content") for m in (history or [])[-Config.PROMPT_HISTORY_MESSAGES:] if isinstance(m, dict)]
+    recent = [content for content in recent if isinstance(content, str)]
+    return " ".join(recent + [user_message])
 
-    if any(k in msg_low for k in ["go to", "open", "navigate", "click", "tab", "sidebar", "menu"]):
-        selected_examples += EXAMPLES_BY_CATEGORY["navigation"]
-        
-    # Default to search if nothing else matched but we have content
-    if not selected_examples and user_message:
-        selected_examples = EXAMPLES_BY_CATEGORY["search"]
+def format_collections(user_message, history, all_cols):
+    query = conversation_query(user_message, history)
+    selected, omitted = rank_collections(query, all_cols, Config.PROMPT_MAX_COLLECTIONS)
+    if not omitted:
+        return str(selected)
+    more = "more " if selected else ""
+    return f"{selected} (+{omitted} {more}collections not listed; if the user needs one of them, call `get_schema` with its exact name or ask the user which collection to use)"
+
+def select_examples(user_message, history=None):
+    """
+    Picks the most relevant example snippets for the message and recent history
+    (so a bare "Yes"/"Proceed" still retrieves the write being confirmed), best
+    first, without exceeding the example token budget. Returns a tuple of snippet ids.
+    """
+    if not user_message: return ()
+    scores = EXAMPLE_INDEX.score(tokenize(conversation_query(user_message, history)))
+    # Drop incidental matches (a shared stop-word) that score far below the best one
+    best = max(scores.values(), default=0)
+    ranked = [sid for sid, score in sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+              if score >= best * Config.EXAMPLE_MIN_SCORE_RATIO]
+    # Default to search if nothing matched but we have content
+    if not ranked:
+        ranked = [sid for sid, s in EXAMPLE_SNIPPETS.items() if s["category"] == "search"]
+
+    selected, used = [], 0
+    for sid in ranked:
+        if sid in selected: continue
+        group = [sid]
+        # A write example must always travel with a confirmation example
+        if EXAMPLE_SNIPPETS[sid]["writes"] and not any(c in selected or c == sid for c in CONFIRMATION_EXAMPLES):
+            group.append(next((c for c in ranked if c in CONFIRMATION_EXAMPLES), CONFIRMATION_EXAMPLES[0]))
+        cost = sum(EXAMPLE_SNIPPETS[g]["tokens"] for g in group)
+        if used + cost > Config.EXAMPLE_TOKEN_BUDGET or len(selected) + len(group) > Config.EXAMPLE_TOP_K: continue
+        selected.extend(group)
+        used += cost
+        if len(selected) >= Config.EXAMPLE_TOP_K: break
+    return tuple(selected)
+
+@lru_cache(maxsize=256)
+def render_system_prompt(collections, example_ids, ui_context):
+    # Memoized: equivalent selections reuse the same prompt string
+    selected_examples = "\n\n".join(EXAMPLE_SNIPPETS[sid]["text"] for sid in example_ids)
 
     # Use provided UI Context or empty
     final_ui_context = f"UI_CONTEXT: {ui_context}" if ui_context else "UI INTERACTION: No specific UI context provided. Do not suggest DOM actions unless user strictly specifies selectors."
 
     return SYSTEM_PROMPT_TEMPLATE.format(
-        collections=all_cols, 
+        collections=collections,
         examples=selected_examples + "\n" + final_ui_context,
         limit=Config.DEFAULT_LIMIT
     )
 
+async def get_system_prompt(user_message="", ui_context="", history=None):
+    all_cols = await get_collection_names(get_db())
+    return render_system_prompt(
+        format_collections(user_message, history, all_cols),
+        select_examples(user_message, history),
+        ui_context or ""
+    )
+
 async def execute_mongo_query(query_data_dict):
+    db = get_db()
     if db is None: return "Error: No database connection."
     try:
         action = query_data_dict.get("action", "query")
         col_name = query_data_dict.get("collection")
         collection = db[col_name]
+        if action in ("insert", "update", "insert_many", "bulk_write"):
+            # Inserts and upserts may create collections
+            invalidate_collection_catalog()
         limit = Config.DEFAULT_LIMIT
         
         if action == "query":
@@ -132,12 +176,138 @@ async def execute_mongo_query(query_data_dict):
             result = await collection.delete_many(filter_data)
             return {"status": "success", "deleted_count": result.deleted_count}
 
+        elif action == "insert_many":
+            documents = query_data_dict.get("documents")
+            if not isinstance(documents, list) or not documents: return "Error: insert_many requires a non-empty 'documents' list."
+            return summarize_bulk_result(await bulk_insert(collection, documents))
+
+        elif action == "bulk_write":
+            operations = query_data_dict.get("operations")
+            if not isinstance(operations, list) or not operations: return "Error: bulk_write requires a non-empty 'operations' list."
+            return summarize_bulk_result(await bulk_write_operations(collection, operations))
+
         else:
             return f"Error: Unknown action '{action}'"
 
     except Exception as e:
         return f"Database Error: {str(e)}"
 
+# --- Bulk Writes ---
+
+def parse_bulk_operation(op):
+    """
+    Converts one protocol operation, e.g. {"update_one": {"filter": {...}, "update": {...}}},
+    into a pymongo write request. Raises ValueError for malformed or unsafe operations.
+    """
+    if not isinstance(op, dict) or len(op) != 1:
+        raise ValueError("Each operation must be an object with exactly one key, e.g. {\"insert_one\": {...}}")
+    name, args = next(iter(op.items()))
+    if not isinstance(args, dict): raise ValueError(f"Arguments for '{name}' must be an object.")
+
+    if name == "insert_one":
+        doc = args.get("document")
+        if not isinstance(doc, dict): raise ValueError("insert_one requires a 'document' object.")
+        return InsertOne(doc)
+
+    # Everything pymongo would reject while building the batch is checked here,
+    # so a bad item is reported alone instead of failing its whole chunk
+    filter_data = args.get("filter")
+    if name in ("update_one", "update_many", "replace_one", "delete_one", "delete_many"):
+        if not filter_data: raise ValueError(f"{name} requires a filter for safety.")
+        if not isinstance(filter_data, dict): raise ValueError(f"{name} 'filter' must be an object.")
+
+    if name in ("update_one", "update_many"):
+        update_data = args.get("update")
+        if not update_data: raise ValueError(f"{name} requires an 'update' document.")
+        if isinstance(update_data, list):
+            # Aggregation pipeline update
+            if not all(isinstance(stage, dict) for stage in update_data):
+                raise ValueError(f"{name} pipeline stages must be objects.")
+        elif not isinstance(update_data, dict) or not next(iter(update_data)).startswith("$"):
+            raise ValueError(f"{name} 'update' must use $ operators, e.g. {{\"$set\": {{...}}}}.")
+        request_cls = UpdateOne if name == "update_one" else UpdateMany
+        return request_cls(filter_data, update_data, upsert=bool(args.get("upsert", False)))
+    if name == "replace_one":
+        replacement = args.get("replacement")
+        if not isinstance(replacement, dict): raise ValueError("replace_one requires a 'replacement' object.")
+        if any(str(key).startswith("$") for key in replacement):
+            raise ValueError("replace_one 'replacement' must not contain $ operators; use update_one instead.")
+        return ReplaceOne(filter_data, replacement, upsert=bool(args.get("upsert", False)))
+    if name == "delete_one":
+        return DeleteOne(filter_data)
+    if name == "delete_many":
+        return DeleteMany(filter_data)
+    raise ValueError(f"Unknown bulk operation '{name}'")
+
+def new_bulk_summary():
+    return {"inserted_count": 0, "matched_count": 0, "modified_count": 0, "deleted_count": 0, "upserted_count": 0, "errors": []}
+
+def merge_bulk_summary(total, part):
+    for key, value in part.items():
+        if key == "errors": total["errors"].extend(value)
+        else: total[key] += value
+    return total
+
+async def run_bulk_requests(collection, indexed_requests):
+    """
+    Executes (index, request) pairs unordered, in chunks of Config.BULK_CHUNK_SIZE.
+    A failing item never stops the others; its error is reported under its original index.
+    """
+    summary = new_bulk_summary()
+    for start in range(0, len(indexed_requests), Config.BULK_CHUNK_SIZE):
+        chunk = indexed_requests[start:start + Config.BULK_CHUNK_SIZE]
+        try:
+            result = await collection.bulk_write([request for _, request in chunk], ordered=False)
+            counts = {
+                "inserted_count": result.inserted_count, "matched_count": result.matched_count,
+                "modified_count": result.modified_count, "deleted_count": result.deleted_count,
+                "upserted_count": result.upserted_count,
+            }
+        except BulkWriteError as e:
+            details = e.details
+            counts = {
+                "inserted_count": details.get("nInserted", 0), "matched_count": details.get("nMatched", 0),
+                "modified_count": details.get("nModified", 0), "deleted_count": details.get("nRemoved", 0),
+                "upserted_count": details.get("nUpserted", 0),
+            }
+            for err in details.get("writeErrors", []):
+                summary["errors"].append({"index": chunk[err["index"]][0], "error": err.get("errmsg", "Write error")})
+        except Exception as e:
+            # e.g. a dropped connection: the whole chunk is unaccounted for
+            counts = {}
+            summary["errors"].extend({"index": index, "error": str(e)} for index, _ in chunk)
+        merge_bulk_summary(summary, counts)
+    return summary
+
+async def bulk_insert(collection, documents):
+    indexed, errors = [], []
+    for i, doc in enumerate(documents):
+        if isinstance(doc, dict): indexed.append((i, InsertOne(doc)))
+        else: errors.append({"index": i, "error": "Document must be an object."})
+    summary = await run_bulk_requests(collection, indexed)
+    summary["errors"] = sorted(errors + summary["errors"], key=lambda e: e["index"])
+    return summary
+
+async def bulk_write_operations(collection, operations):
+    indexed, errors = [], []
+    for i, op in enumerate(operations):
+        try:
+            indexed.append((i, parse_bulk_operation(op)))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+    summary = await run_bulk_requests(collection, indexed)
+    summary["errors"] = sorted(errors + summary["errors"], key=lambda e: e["index"])
+    return summary
+
+def summarize_bulk_result(summary):
+    # Keep the result fed back to the model short even when many items fail
+    result = {"status": "partial" if summary["errors"] else "success"}
+    result.update({k: v for k, v in summary.items() if k != "errors" and v})
+    if summary["errors"]:
+        result["error_count"] = len(summary["errors"])
+        result["errors"] = summary["errors"][:Config.BULK_MAX_REPORTED_ERRORS]
+    return result
+
 def extract_json_actions(content):
     actions = []
     
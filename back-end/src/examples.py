@@ -1,3 +1,6 @@
+import re
+from src.search import BM25Index, tokenize
+
 EXAMPLES_BY_CATEGORY = {
     "search": """
 EXAMPLE: Text Search (Ambiguous fields)
@@ -81,6 +84,45 @@ Output: ```json
   "collection": "users",
   "filter": { "email": "tester@test.com" }
 }
+```""",
+
+    "bulk": """
+EXAMPLE: Bulk Insert (Many Documents, One Step)
+User: "Add these students: Alice 101 CSE, Bob 102 ECE, Carol 103 MECH"
+Assistant: "I'll add these 3 students in one go:
+- Alice (101, CSE)
+- Bob (102, ECE)
+- Carol (103, MECH)
+Shall I proceed?"
+User: "Yes"
+Output: ```json
+{
+  "action": "insert_many",
+  "collection": "students",
+  "documents": [
+    { "name": "Alice", "rollNo": 101, "dept": "CSE" },
+    { "name": "Bob", "rollNo": 102, "dept": "ECE" },
+    { "name": "Carol", "rollNo": 103, "dept": "MECH" }
+  ]
+}
+```
+
+EXAMPLE: Mixed Bulk Changes
+User: "Mark Alice as graduated and remove the duplicate Bob entry with roll 999"
+Assistant: "I'll make these 2 changes together:
+- Update Alice's status to 'graduated'
+- Delete Bob's duplicate entry (Roll No 999)
+Shall I proceed?"
+User: "Confirm"
+Output: ```json
+{
+  "action": "bulk_write",
+  "collection": "students",
+  "operations": [
+    { "update_one": { "filter": { "name": "Alice" }, "update": { "$set": { "status": "graduated" } } } },
+    { "delete_one": { "filter": { "name": "Bob", "rollNo": 999 } } }
+  ]
+}
 ```""",
 
     "iterative": """
@@ -164,3 +206,52 @@ Output: ```json
 [SUGGESTIONS]["Change password", "Update notification", "Delete account"][/SUGGESTIONS]
 """
 }
+
+# --- Indexed Example Snippets ---
+# Each category is split into individual examples so the engine can retrieve
+# only the few that match a request instead of whole category blocks.
+
+# Intent vocabulary per category; indexed alongside each example's title and user lines
+CATEGORY_KEYWORDS = {
+    "search": "find search lookup list show get who email phone contact name",
+    "aggregation": "how many count average avg sum total math statistics",
+    "bulk": "bulk batch import many multiple",
+    "iterative": "add insert create new update change edit modify remove delete confirm",
+    "navigation": "go to open navigate click switch tab sidebar menu page button",
+}
+
+# The "crud" examples execute writes without the confirmation turn required by
+# the protocol, so (as before) they are never shown to the model
+UNINDEXED_CATEGORIES = {"crud"}
+
+# Examples demonstrating the summarize -> confirm -> execute flow. Whenever a
+# write example is selected, one of these is selected with it.
+CONFIRMATION_EXAMPLES = ("iterative:1", "iterative:2")
+
+_WRITE_ACTION = re.compile(r'"action":\s*"(insert|update|delete|insert_many|bulk_write)"')
+
+def _split_examples():
+    snippets = []
+    for category, block in EXAMPLES_BY_CATEGORY.items():
+        if category in UNINDEXED_CATEGORIES: continue
+        for i, text in enumerate(re.split(r"\n(?=EXAMPLE: )", block.strip())):
+            text = text.strip()
+            if not text: continue
+            title = text.splitlines()[0].replace("EXAMPLE:", "").strip()
+            user_lines = [l for l in text.splitlines() if l.startswith("User:")]
+            snippets.append({
+                "id": f"{category}:{i}",
+                "category": category,
+                "title": title,
+                "text": text,
+                "tokens": len(text) // 4,  # Rough token estimate
+                "writes": bool(_WRITE_ACTION.search(text)),
+                "terms": tokenize(" ".join([CATEGORY_KEYWORDS.get(category, ""), title] + user_lines)),
+            })
+    return snippets
+
+EXAMPLE_SNIPPETS = {s["id"]: s for s in _split_examples()}
+
+EXAMPLE_INDEX = BM25Index()
+for _snippet in EXAMPLE_SNIPPETS.values():
+    EXAMPLE_INDEX.add(_snippet["id"], _snippet["terms"])
@@ -1,16 +1,39 @@
 import asyncio
 import random
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
 from src.config import Config
 
-client = AsyncOpenAI(
-    api_key=Config.API_KEY,
-    base_url=Config.OPENROUTER_BASE_URL,
-)
+# Created lazily (normally by the app lifespan) so importing this module stays cheap
+_client = None
+
+def get_client():
+    """Returns the shared AsyncOpenAI client, creating it with pooled connections on first use."""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=Config.API_KEY,
+            base_url=Config.OPENROUTER_BASE_URL,
+            timeout=Config.LLM_TIMEOUT,
+            max_retries=Config.LLM_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=Config.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+    _client = None
 
 async def call_llm_stream(messages, temperature=0.1):
     try:
-        response = await client.chat.completions.create(
+        response = await get_client().chat.completions.create(
             model=Config.MODEL_NAME,
             messages=messages,
             temperature=temperature,
@@ -24,7 +47,7 @@ async def call_llm_with_retry(messages, temperature=0.1, max_retries=3):
     base_delay = 2
     for attempt in range(max_retries):
         try:
-            response = await client.chat.completions.create(
+            response = await get_client().chat.completions.create(
                 model=Config.MODEL_NAME,
                 messages=messages,
                 temperature=temperature,
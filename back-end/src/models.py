@@ -13,3 +13,7 @@ class MongoAction(BaseModel):
     filter: Optional[Dict[str, Any]] = None
     pipeline: Optional[List[Dict[str, Any]]] = None
     projection: Optional[Dict[str, Any]] = None
+    document: Optional[Dict[str, Any]] = None
+    documents: Optional[List[Dict[str, Any]]] = None
+    update: Optional[Dict[str, Any]] = None
+    operations: Optional[List[Dict[str, Any]]] = None
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from src.config import Config
+from src.stream import structured_events, run_event, error_event
+
+# --- Resumable Agent Runs ---
+# Agent runs execute on a bounded pool of background workers instead of inside
+# the HTTP response. Every event is appended to a per-run buffer with an offset,
+# so a client that drops its connection can reattach with (run_id, offset)
+# without the LLM and DB work being repeated.
+
+SHUTDOWN_MESSAGE = "Run cancelled: server shutting down"
+
+class RunQueueFull(Exception):
+    pass
+
+class Run:
+    def __init__(self, run_id, event_source):
+        self.run_id = run_id
+        self.event_source = event_source  # Zero-arg callable returning an async iterator of events
+        self.events = []
+        self.size = 0  # Approximate buffered bytes
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.finished_at = None
+        self._updated = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def append(self, event):
+        event = {**event, "offset": len(self.events)}
+        self.events.append(event)
+        self.size += len(json.dumps(event))
+        self._notify()
+
+    def finish(self, status):
+        self.status = status
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self):
+        # Wake current readers; later readers wait on a fresh event
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def follow(self, offset=0):
+        """Yields buffered events from `offset`, then live ones until the run finishes."""
+        while True:
+            while offset < len(self.events):
+                yield self.events[offset]
+                offset += 1
+            if self.finished: return
+            await self._updated.wait()
+
+class RunManager:
+    """
+    Owns the worker pool and the run buffers. Completed runs are kept for
+    Config.RUN_TTL seconds, and the oldest are dropped first whenever buffered
+    output exceeds Config.RUN_BUFFER_BUDGET_BYTES.
+    """
+    def __init__(self, workers=None, queue_size=None):
+        self.worker_count = Config.RUN_WORKERS if workers is None else workers
+        self.queue_size = Config.RUN_QUEUE_SIZE if queue_size is None else queue_size
+        self.runs = {}  # run_id -> Run, in creation order
+        self.queue = None
+        self.workers = []
+
+    def start(self):
+        if self.workers: return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        # Runs that never reached a worker must still end, or their followers wait forever
+        while self.queue is not None and not self.queue.empty():
+            run = self.queue.get_nowait()
+            run.append(error_event(SHUTDOWN_MESSAGE))
+            run.finish("failed")
+
+    def submit(self, event_source):
+        """Queues a run and returns it immediately. Raises RunQueueFull when saturated."""
+        if not self.workers:
+            raise RuntimeError("RunManager has not been started.")
+        self.evict()
+        run = Run(uuid.uuid4().hex, event_source)
+        try:
+            self.queue.put_nowait(run)
+        except asyncio.QueueFull:
+            raise RunQueueFull("Too many agent runs in progress, try again shortly.")
+        self.runs[run.run_id] = run
+        run.append(run_event(run.run_id))
+        return run
+
+    def get(self, run_id):
+        return self.runs.get(run_id)
+
+    def evict(self):
+        now = time.time()
+        for run_id, run in list(self.runs.items()):
+            if run.finished and now - run.finished_at > Config.RUN_TTL:
+                del self.runs[run_id]
+
+        total = sum(run.size for run in self.runs.values())
+        if total <= Config.RUN_BUFFER_BUDGET_BYTES: return
+        # Oldest completed runs go first; active runs are never dropped
+        for run in sorted((r for r in self.runs.values() if r.finished), key=lambda r: r.finished_at):
+            del self.runs[run.run_id]
+            total -= run.size
+            if total <= Config.RUN_BUFFER_BUDGET_BYTES: break
+
+    async def _worker(self):
+        while True:
+            run = await self.queue.get()
+            try:
+                await self._execute(run)
+            finally:
+                self.queue.task_done()
+
+    async def _execute(self, run):
+        run.status = "running"
+        status = "completed"
+        try:
+            async for event in structured_events(run.event_source()):
+                run.append(event)
+                # agent_events reports its own LLM/DB failures as error events
+                if event["type"] == "error": status = "failed"
+        except asyncio.CancelledError:
+            run.append(error_event(SHUTDOWN_MESSAGE))
+            status = "failed"
+            raise
+        except Exception as e:
+            logging.error(f"Run {run.run_id} failed: {e}")
+            run.append(error_event("Error processing request"))
+            status = "failed"
+        finally:
+            run.finish(status)
+            self.evict()
+
+# Global singleton
+run_manager = RunManager()
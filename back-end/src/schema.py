@@ -1,11 +1,20 @@
+import asyncio
 import time
 from datetime import datetime
 from bson import ObjectId
 from src.config import Config
+from src.search import BM25Index, tokenize
 
 # --- Schema Cache ---
 SCHEMA_CACHE = {}
 
+# --- Collection Catalog Cache ---
+COLLECTION_CATALOG = {"names": None, "timestamp": 0}
+
+# --- Collection Relevance Index ---
+# Collection names (weighted) plus any cataloged field names, kept in sync incrementally.
+COLLECTION_INDEX = BM25Index()
+
 def map_field_type(value):
     if isinstance(value, str): return "String"
     if isinstance(value, int): return "Integer"
@@ -44,16 +53,75 @@ async def analyze_collection_schema(collection, sample_size=3, force_refresh=Fal
     
     final_schema = {k: "/".join(sorted(list(v))) for k, v in schema.items()}
     SCHEMA_CACHE[col_name] = {"schema": final_schema, "timestamp": now}
+    if col_name in COLLECTION_INDEX:
+        index_collection(col_name, final_schema.keys())
     return final_schema
 
-async def get_collection_names(db):
-    return await db.list_collection_names() if db is not None else []
+def index_collection(col_name, fields=()):
+    # Repeat the name so a direct hit outranks a collection that merely shares a field
+    tokens = tokenize(col_name) * 2 + tokenize(" ".join(fields))
+    COLLECTION_INDEX.add(col_name, tokens)
+
+def sync_collection_index(collection_names):
+    """Adds new and drops vanished collections without touching unchanged entries."""
+    current = set(collection_names)
+    for col_name in list(COLLECTION_INDEX.docs):
+        if col_name not in current: COLLECTION_INDEX.remove(col_name)
+    for col_name in current:
+        if col_name not in COLLECTION_INDEX:
+            cached = SCHEMA_CACHE.get(col_name, {}).get("schema", {})
+            index_collection(col_name, cached.keys())
+
+def rank_collections(query, collection_names, k):
+    """
+    Returns (selected, omitted_count): at most k collections matching the query,
+    best first. Unmatched collections are left out and only counted, so the
+    prompt pays for relevant names only. Small databases are returned unchanged.
+    """
+    if len(collection_names) <= k:
+        return list(collection_names), 0
+    sync_collection_index(collection_names)
+    selected = COLLECTION_INDEX.top_k(query, k)
+    return selected, len(collection_names) - len(selected)
+
+async def get_collection_names(db, force_refresh=False):
+    if db is None: return []
+    now = time.time()
+    if not force_refresh and COLLECTION_CATALOG["names"] is not None and now - COLLECTION_CATALOG["timestamp"] < Config.CATALOG_TTL:
+        return COLLECTION_CATALOG["names"]
+    names = await db.list_collection_names()
+    COLLECTION_CATALOG.update(names=names, timestamp=now)
+    return names
+
+def invalidate_collection_catalog():
+    # Writes may create collections; re-list on the next prompt
+    COLLECTION_CATALOG["names"] = None
+
+async def warm_schema_cache(db, collection_names, limit=None, concurrency=None):
+    """Samples schemas for up to `limit` collections concurrently and indexes them."""
+    limit = Config.WARMUP_SCHEMA_LIMIT if limit is None else limit
+    semaphore = asyncio.Semaphore(Config.WARMUP_CONCURRENCY if concurrency is None else concurrency)
+    sync_collection_index(collection_names)
+
+    async def warm(col_name):
+        async with semaphore:
+            try:
+                await analyze_collection_schema(db[col_name], sample_size=3)
+            except Exception:
+                pass # A single unreadable collection should not block startup
+
+    await asyncio.gather(*(warm(name) for name in sorted(collection_names)[:limit]))
 
 async def get_specific_collection_schema(db, target_collections):
     if db is None: return "No database connection."
     summary_lines = []
-    available = await db.list_collection_names()
+    available = await get_collection_names(db)
+    refreshed = False
     for col_name in target_collections:
+        if col_name not in available and not refreshed:
+            # The cached catalog may predate collections created elsewhere; re-list once before skipping
+            available = await get_collection_names(db, force_refresh=True)
+            refreshed = True
         if col_name not in available: continue
         schema = await analyze_collection_schema(db[col_name], sample_size=3)
         fields = [f"{k}:{v}" for k, v in schema.items()]
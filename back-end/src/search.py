@@ -0,0 +1,82 @@
+import math
+import re
+from collections import Counter
+
+# --- Lightweight Lexical Search (BM25) ---
+
+_CAMEL_SPLIT = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_WORDS = re.compile(r"[A-Za-z0-9]+")
+
+def tokenize(text):
+    """
+    Splits text into lowercase terms. camelCase and snake_case identifiers are
+    broken into their parts so field names like `rollNo` match "roll no".
+    """
+    tokens = []
+    for word in _WORDS.findall(_CAMEL_SPLIT.sub(" ", text or "")):
+        word = word.lower()
+        # Naive plural folding: "students" -> "student", but keep short words intact
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+class BM25Index:
+    """
+    An in-memory BM25 index keyed by document id.
+    Documents can be added, replaced and removed one at a time, so the index
+    never needs a full rebuild when the underlying data changes.
+    """
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.docs = {}      # doc_id -> set of terms (for removal)
+        self.lengths = {}   # doc_id -> number of terms
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.docs
+
+    def add(self, doc_id, tokens):
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        terms = Counter(tokens)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.docs[doc_id] = set(terms)
+        self.lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id):
+        terms = self.docs.pop(doc_id, None)
+        if terms is None: return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting: del self.postings[term]
+
+    def score(self, query_tokens):
+        """Returns {doc_id: score} for every document sharing a term with the query."""
+        n = len(self.docs)
+        if not n: return {}
+        avg_len = (self.total_length / n) or 1
+        scores = {}
+        for term in set(query_tokens):
+            posting = self.postings.get(term)
+            if not posting: continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def top_k(self, query, k):
+        """Ranks documents for a raw query string, best first. Only matches are returned."""
+        scores = self.score(tokenize(query))
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+        return [doc_id for doc_id, _ in ranked[:k]]
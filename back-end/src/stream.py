@@ -0,0 +1,226 @@
+import asyncio
+import json
+import time
+from src.config import Config
+
+# --- Chat Stream Protocol ---
+# The agent loop yields typed events. "text" keeps the legacy plain-text wire
+# format (in-band markers, one write per token); "sse" and "ndjson" send the
+# events as-is, with text deltas coalesced into short frames.
+
+STREAM_MEDIA_TYPES = {
+    "text": "text/plain",
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+SUGGESTIONS_OPEN = "[SUGGESTIONS]"
+SUGGESTIONS_CLOSE = "[/SUGGESTIONS]"
+
+def text_event(text, cached=False):
+    event = {"type": "text", "text": text}
+    if cached: event["cached"] = True
+    return event
+
+def dom_action_event(action_data):
+    return {"type": "dom_action", "action": action_data}
+
+def tool_status_event(action, status, collection=None, collections=None):
+    event = {"type": "tool_status", "action": action, "status": status}
+    if collection: event["collection"] = collection
+    if collections: event["collections"] = collections
+    return event
+
+def suggestions_event(items):
+    return {"type": "suggestions", "suggestions": items}
+
+def done_event(cached=False):
+    return {"type": "done", "cached": cached}
+
+def error_event(message):
+    return {"type": "error", "message": message}
+
+def run_event(run_id):
+    return {"type": "run", "run_id": run_id}
+
+# --- Encoders ---
+
+def encode_text(event):
+    """Legacy plain-text wire format."""
+    kind = event["type"]
+    if kind == "text":
+        return f"[Cached Answer]\n{event['text']}" if event.get("cached") else event["text"]
+    if kind == "dom_action":
+        return f"[DOM_ACTION]{json.dumps(event['action'])}[/DOM_ACTION]"
+    if kind == "error":
+        return "\n[Error processing request]\n"
+    return ""
+
+def encode_sse(event):
+    # Buffered run events carry an offset, which doubles as the SSE id for Last-Event-ID resumes
+    event_id = f"id: {event['offset']}\n" if "offset" in event else ""
+    return f"{event_id}event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def encode_ndjson(event):
+    return json.dumps(event) + "\n"
+
+ENCODERS = {"text": encode_text, "sse": encode_sse, "ndjson": encode_ndjson}
+
+# --- Structured Mode Transforms ---
+
+def _partial_marker_suffix(text, marker):
+    # Length of the longest suffix of text that could be the start of marker.
+    # Markers contain a single "[" at the start, so only the last "[" can begin one.
+    start = text.rfind("[", max(0, len(text) - len(marker) + 1))
+    if start != -1 and marker.startswith(text[start:]):
+        return len(text) - start
+    return 0
+
+class SuggestionsParser:
+    """
+    Incrementally strips `[SUGGESTIONS][...][/SUGGESTIONS]` out of streamed text,
+    holding back only the few characters that might begin a marker.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.in_block = False
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        while True:
+            if not self.in_block:
+                start = self.buffer.find(SUGGESTIONS_OPEN)
+                if start == -1:
+                    keep = _partial_marker_suffix(self.buffer, SUGGESTIONS_OPEN)
+                    emit = self.buffer[:len(self.buffer) - keep]
+                    self.buffer = self.buffer[len(emit):]
+                    if emit: events.append(text_event(emit))
+                    return events
+                if start: events.append(text_event(self.buffer[:start]))
+                self.buffer = self.buffer[start + len(SUGGESTIONS_OPEN):]
+                self.in_block = True
+            else:
+                end = self.buffer.find(SUGGESTIONS_CLOSE)
+                if end == -1: return events
+                events.append(self._parse(self.buffer[:end]))
+                self.buffer = self.buffer[end + len(SUGGESTIONS_CLOSE):]
+                self.in_block = False
+
+    def flush(self):
+        events = []
+        if self.in_block:
+            # Unterminated block at the end of a step: salvage it if it parses
+            events.append(self._parse(self.buffer))
+        elif self.buffer:
+            events.append(text_event(self.buffer))
+        self.buffer = ""
+        self.in_block = False
+        return events
+
+    def _parse(self, raw):
+        try:
+            items = json.loads(raw.strip())
+            if isinstance(items, list):
+                return suggestions_event([str(i) for i in items])
+        except Exception:
+            pass
+        return suggestions_event([])
+
+async def extract_suggestions(events):
+    parser = SuggestionsParser()
+    async for event in events:
+        if event["type"] == "text":
+            for out in parser.feed(event["text"]):
+                yield out
+            continue
+        # Any non-text event ends the current text run
+        for out in parser.flush():
+            yield out
+        yield event
+    for out in parser.flush():
+        yield out
+
+_END = object()
+
+async def _pump(iterator, queue):
+    # Single long-lived reader feeding coalesce_text once a frame timer is needed
+    try:
+        async for event in iterator:
+            await queue.put((event, None))
+        await queue.put((_END, None))
+    except Exception as e:
+        await queue.put((None, e))
+
+async def coalesce_text(events, interval=None, max_chars=None):
+    """
+    Batches consecutive text deltas into frames, flushed when the frame is
+    `interval` seconds old, reaches `max_chars`, or a non-text event arrives.
+    """
+    interval = Config.STREAM_FRAME_INTERVAL if interval is None else interval
+    max_chars = Config.STREAM_FRAME_MAX_CHARS if max_chars is None else max_chars
+    iterator = events.__aiter__()
+    queue, reader = None, None
+    frame, frame_len, frame_started = [], 0, 0.0
+    try:
+        while True:
+            if reader is None and not frame:
+                # Fast path: nothing to flush on a timer, so read the source directly
+                try:
+                    event = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if reader is None:
+                    # A frame is open: hand reading to one task so waits can time out safely
+                    queue = asyncio.Queue(maxsize=Config.STREAM_FRAME_MAX_CHARS)
+                    reader = asyncio.create_task(_pump(iterator, queue))
+                if not queue.empty():
+                    event, error = queue.get_nowait()
+                elif frame:
+                    try:
+                        async with asyncio.timeout(frame_started + interval - time.monotonic()):
+                            event, error = await queue.get()
+                    except TimeoutError:
+                        yield text_event("".join(frame))
+                        frame, frame_len = [], 0
+                        continue
+                else:
+                    event, error = await queue.get()
+                if error is not None: raise error
+                if event is _END: break
+
+            if event["type"] == "text":
+                if not frame: frame_started = time.monotonic()
+                frame.append(event["text"])
+                frame_len += len(event["text"])
+                if frame_len >= max_chars:
+                    yield text_event("".join(frame))
+                    frame, frame_len = [], 0
+                continue
+            if frame:
+                yield text_event("".join(frame))
+                frame, frame_len = [], 0
+            yield event
+        if frame:
+            yield text_event("".join(frame))
+    finally:
+        if reader is not None:
+            reader.cancel()
+
+def structured_events(events):
+    """Structured mode: suggestions become their own event and text is framed."""
+    return coalesce_text(extract_suggestions(events))
+
+async def encode_events(events, stream_format="text"):
+    encode = ENCODERS[stream_format]
+    async for event in events:
+        chunk = encode(event)
+        if chunk: yield chunk
+
+def encode_stream(events, stream_format="text"):
+    """Turns an agent event stream into the chosen wire format."""
+    if stream_format != "text":
+        # The cache flag travels on the done event instead of a text prefix
+        events = structured_events(events)
+    return encode_events(events, stream_format)